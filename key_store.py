@@ -0,0 +1,131 @@
+import os
+import sqlite3
+from typing import List, Optional, Tuple
+
+
+class LocalKeyStore:
+    """
+    Локальная копия списка ключей в SQLite.
+
+    Пока Redis доступен, хранилище лишь зеркалит keys_list. Когда Redis недоступен,
+    ключи выдаются отсюда атомарно (в том числе между воркерами), а каждая операция
+    пишется в журнал, чтобы после восстановления Redis её можно было повторить там.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # соединение SQLite нельзя переносить через fork, поэтому открываем его в каждом процессе
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._pid = os.getpid()
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript('''
+                CREATE TABLE IF NOT EXISTS keys (id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL UNIQUE);
+                CREATE TABLE IF NOT EXISTS journal (id INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, key TEXT NOT NULL);
+                CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+                INSERT OR IGNORE INTO meta (name, value) SELECT 'keys_count', count(*) FROM keys;
+                INSERT OR IGNORE INTO meta (name, value) SELECT 'seeded', 1
+                    WHERE EXISTS (SELECT 1 FROM keys) OR EXISTS (SELECT 1 FROM journal);
+                CREATE TRIGGER IF NOT EXISTS keys_count_insert AFTER INSERT ON keys
+                    BEGIN UPDATE meta SET value = value + 1 WHERE name = 'keys_count'; END;
+                CREATE TRIGGER IF NOT EXISTS keys_count_delete AFTER DELETE ON keys
+                    BEGIN UPDATE meta SET value = value - 1 WHERE name = 'keys_count'; END;
+            ''')
+        return self._conn
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT value FROM meta WHERE name = 'keys_count'").fetchone()[0]
+
+    def all(self) -> List[str]:
+        return [row[0] for row in self.conn.execute('SELECT key FROM keys ORDER BY id')]
+
+    def is_seeded(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM meta WHERE name = 'seeded'").fetchone() is not None
+
+    def seed(self, keys: List[str]) -> bool:
+        """
+        Однократно заполняет хранилище ключами из файла. После этого пустое хранилище
+        означает, что ключи закончились, а не что файл нужно перечитать.
+
+        :return: True, если ключи были загружены
+        """
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE name = 'seeded'").fetchone():
+                conn.execute('COMMIT')
+                return False
+            conn.executemany('INSERT OR IGNORE INTO keys (key) VALUES (?)', [(k,) for k in keys])
+            conn.execute("INSERT INTO meta (name, value) VALUES ('seeded', 1)")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return True
+
+    def pop(self) -> Optional[str]:
+        """Атомарно забирает первый ключ и записывает выдачу в журнал."""
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT id, key FROM keys ORDER BY id LIMIT 1').fetchone()
+            if row:
+                conn.execute('DELETE FROM keys WHERE id = ?', (row[0],))
+                conn.execute("INSERT INTO journal (op, key) VALUES ('issue', ?)", (row[1],))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return row[1] if row else None
+
+    def discard(self, key: str):
+        """Убирает ключ, уже выданный через Redis."""
+        self.conn.execute('DELETE FROM keys WHERE key = ?', (key,))
+
+    def add(self, keys: List[str], journal: bool = False) -> List[str]:
+        """Добавляет ключи, пропуская дубликаты. Возвращает реально добавленные."""
+        conn = self.conn
+        added = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key in keys:
+                if conn.execute('INSERT OR IGNORE INTO keys (key) VALUES (?)', (key,)).rowcount:
+                    added.append(key)
+            if journal:
+                conn.executemany("INSERT INTO journal (op, key) VALUES ('add', ?)", [(k,) for k in added])
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('seeded', 1)")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return added
+
+    def replace_all(self, keys: List[str]):
+        """Делает хранилище точной копией списка ключей из Redis. Журнал не трогает."""
+        conn = self.conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM keys')
+            conn.executemany('INSERT OR IGNORE INTO keys (key) VALUES (?)', [(k,) for k in keys])
+            # источником стал Redis, файл больше не нужен
+            conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('seeded', 1)")
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def has_pending(self) -> bool:
+        return self.conn.execute('SELECT 1 FROM journal LIMIT 1').fetchone() is not None
+
+    def pending(self) -> List[Tuple[int, str, str]]:
+        """Операции, сделанные без Redis: (id, 'issue' | 'add', ключ) в порядке выполнения."""
+        return self.conn.execute('SELECT id, op, key FROM journal ORDER BY id').fetchall()
+
+    def mark_synced(self, last_id: int):
+        self.conn.execute('DELETE FROM journal WHERE id <= ?', (last_id,))
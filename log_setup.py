@@ -0,0 +1,116 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import sys
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна JSON-строка."""
+
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Схлопывает повторяющиеся ошибки: запись уровня WARNING и выше с тем же текстом
+    и исключением из того же места в коде пропускается не чаще раза в window секунд. К следующей
+    пропущенной записи дописывается, сколько повторов было подавлено.
+
+    Записи с extra={'collapse': False} не схлопываются никогда.
+    """
+
+    max_entries = 10000
+
+    def __init__(self, window: float = 60):
+        super().__init__()
+        self.window = window
+        self._seen = {}  # (logger, level, файл, строка, сообщение, исключение) -> [время последней записи, подавлено]
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or not getattr(record, 'collapse', True):
+            return True
+
+        # одинаковый текст с разными исключениями (logging.exception) — разные записи
+        error = repr(record.exc_info[1]) if record.exc_info else None
+        key = (record.name, record.levelno, record.pathname, record.lineno, str(record.msg), error)
+        seen = self._seen.get(key)
+        if seen and record.created - seen[0] < self.window:
+            seen[1] += 1
+            return False
+
+        if seen and seen[1]:
+            record.msg = f'{record.getMessage()} (ещё {seen[1]} повторов подавлено)'
+            record.args = None
+        if len(self._seen) >= self.max_entries:
+            # сообщения с переменными частями копятся, выкидываем давно не повторявшиеся
+            self._seen = {k: v for k, v in self._seen.items() if record.created - v[0] < self.window}
+        self._seen[key] = [record.created, 0]
+        return True
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # В очередь кладём уже готовое сообщение и текст исключения: так запись
+        # можно передать в другой процесс, а JSON-формат сохраняет поле exc
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(filename: str = 'bot.log', max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  multiprocess: bool = False, repeat_window: float = 60):
+    """
+    Настраивает root logger так, что хендлеры только кладут запись в очередь,
+    а в консоль и в файл (с ротацией по размеру, в JSON) пишет фоновый поток.
+
+    :param multiprocess: использовать очередь multiprocessing, чтобы форкнутые воркеры
+        писали в тот же поток-слушатель, а ротацией файла занимался один процесс
+    """
+    log_queue = multiprocessing.Queue(-1) if multiprocess else queue.SimpleQueue()
+
+    # Логирование в консоль
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
+
+    # Логирование в файл
+    file_handler = logging.handlers.RotatingFileHandler(filename, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding='utf-8')
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(JsonFormatter(datefmt=DATE_FORMAT))
+
+    listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = LogQueueHandler(log_queue)
+    queue_handler.addFilter(RepeatFilter(repeat_window))
+
+    # Настройка root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(queue_handler)
+    return listener
@@ -0,0 +1,99 @@
+import asyncio
+
+import redis.asyncio as redis
+
+import tracing
+
+
+class AutoPipelineRedis:
+    """
+    Обёртка над redis.asyncio.Redis, через которую идут все обращения бота к Redis.
+
+    Команды, которые корутины отправили за один проход event loop, уходят в Redis
+    одним пайплайном, то есть за один round trip. Вызываются как у обычного клиента:
+    await redis_client.hset(key, mapping=...), await redis_client.lpop('keys_list') и т.д.
+    Ошибка одной команды достаётся только вызвавшей её корутине.
+    """
+
+    def __init__(self, client: redis.Redis, command_timeout: float = 2.0):
+        self.client = client
+        self.command_timeout = command_timeout
+        self._queue = []
+        self._flush_scheduled = False
+        self._tasks = set()
+
+    @classmethod
+    def from_url(cls, url: str, pool_size: int = 20, socket_timeout: float = 5.0, command_timeout: float = 2.0):
+        # Каждый проход loop с командами — отдельный пайплайн, и при медленном Redis их в полёте
+        # может быть больше pool_size. Обычный пул на этом падает с «Too many connections»,
+        # блокирующий ставит пайплайн в очередь за свободным соединением
+        pool = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=pool_size,
+            timeout=command_timeout,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+            decode_responses=True,
+        )
+        return cls(redis.Redis(connection_pool=pool), command_timeout=command_timeout)
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def command(*args, **kwargs):
+            return self._enqueue(name, args, kwargs)
+
+        return command
+
+    def pubsub(self, **kwargs):
+        # pub/sub держит своё соединение и в пайплайн не попадает
+        return self.client.pubsub(**kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+        await self.client.connection_pool.disconnect()
+
+    async def _enqueue(self, name: str, args: tuple, kwargs: dict):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((name, args, kwargs, future))
+        if not self._flush_scheduled:
+            # отправим всё накопленное, когда отработают остальные корутины этого прохода loop
+            self._flush_scheduled = True
+            loop.call_soon(self._flush)
+
+        with tracing.span(f'redis.{name}'):
+            try:
+                return await asyncio.wait_for(future, self.command_timeout)
+            except asyncio.TimeoutError:
+                raise redis.TimeoutError(f'Redis command {name} timed out after {self.command_timeout}s')
+
+    def _flush(self):
+        self._flush_scheduled = False
+        batch, self._queue = self._queue, []
+        task = asyncio.create_task(self._execute(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, batch: list):
+        try:
+            if len(batch) == 1:
+                name, args, kwargs, _ = batch[0]
+                results = [await getattr(self.client, name)(*args, **kwargs)]
+            else:
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for name, args, kwargs, _ in batch:
+                        getattr(pipe, name)(*args, **kwargs)
+                    results = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, _, future), result in zip(batch, results):
+            # future уже отменён, если вызвавшая корутина не дождалась ответа
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,289 @@
+import asyncio
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+
+import pytest
+import redis.asyncio as redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main читает настройки при импорте
+os.environ.update({
+    'API_TOKEN': '42:TEST',
+    'CHANNELS': '@channel1,@channel2',
+    'KEYS_FILENAME': 'keys.txt',
+    'ADMINS': '1',
+    'KEYS_LEN_ALERT': '2',
+    'PROXY_URL': '',
+})
+
+from aiogram import types  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+
+import main  # noqa: E402
+from key_store import LocalKeyStore  # noqa: E402
+from redis_layer import AutoPipelineRedis  # noqa: E402
+from user_cache import UserCache  # noqa: E402
+
+
+class FakeSession(BaseSession):
+    """Bot API в памяти: ничего не отправляет, считает вызовы по методам."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+        self.unsubscribed = set()  # (канал, user_id), для которых getChatMember вернёт left
+
+    async def make_request(self, bot, method, timeout=None):
+        name = method.__api_method__
+        self.calls[name] += 1
+        if name == 'getChatMember':
+            user = types.User(id=method.user_id, is_bot=False, first_name='User')
+            if (method.chat_id, method.user_id) in self.unsubscribed:
+                return types.ChatMemberLeft(user=user)
+            return types.ChatMemberMember(user=user)
+        if name == 'getMe':
+            return types.User(id=42, is_bot=True, first_name='Bot', username='test_bot')
+        if name == 'sendMessage':
+            return types.Message(message_id=1, date=datetime.now(), chat=types.Chat(id=method.chat_id, type='private'),
+                                 text=method.text)
+        return True
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        # скачивание файлов в сценариях не участвует, отдаём пустой файл
+        yield b''
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return command
+
+    async def execute(self, raise_on_error=True):
+        self.redis.round_trips += 1
+        results = []
+        for name, args, kwargs in self.commands:
+            try:
+                results.append(self.redis.run(name, args, kwargs))
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
+
+
+class FakeRedis:
+    """Redis в памяти с decode_responses=True. Считает команды и round trip'ы."""
+
+    def __init__(self):
+        self.data = {}
+        self.ops = Counter()
+        self.round_trips = 0
+        self.down = False  # True — каждая команда падает, как при обрыве соединения
+
+    @property
+    def total_ops(self) -> int:
+        return sum(self.ops.values())
+
+    def reset_counters(self):
+        self.ops.clear()
+        self.round_trips = 0
+
+    def forget(self, prefix: str):
+        for key in [k for k in self.data if k.startswith(prefix)]:
+            del self.data[key]
+
+    def run(self, name, args, kwargs):
+        if self.down:
+            raise redis.ConnectionError('Redis is down')
+        self.ops[name] += 1
+        return getattr(self, f'_{name}')(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        async def command(*args, **kwargs):
+            self.round_trips += 1
+            return self.run(name, args, kwargs)
+
+        return command
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def aclose(self):
+        pass
+
+    def _ping(self):
+        return True
+
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def _delete(self, *keys):
+        return len([self.data.pop(k) for k in keys if k in self.data])
+
+    def _setex(self, key, ttl, value):
+        self.data[key] = str(value)
+        return True
+
+    def _expire(self, key, ttl):
+        return key in self.data
+
+    def _hgetall(self, key):
+        return dict(self.data.get(key, {}))
+
+    def _hset(self, key, field=None, value=None, mapping=None):
+        h = self.data.setdefault(key, {})
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = len([f for f in items if str(f) not in h])
+        h.update({str(f): str(v) for f, v in items.items()})
+        return added
+
+    def _hdel(self, key, *fields):
+        h = self.data.get(key, {})
+        return len([h.pop(str(f)) for f in fields if str(f) in h])
+
+    def _rpush(self, key, *values):
+        lst = self.data.setdefault(key, [])
+        lst.extend(str(v) for v in values)
+        return len(lst)
+
+    def _lpop(self, key):
+        lst = self.data.get(key)
+        return lst.pop(0) if lst else None
+
+    def _llen(self, key):
+        return len(self.data.get(key, []))
+
+    def _lrange(self, key, start, end):
+        lst = self.data.get(key, [])
+        return lst[start:] if end == -1 else lst[start:end + 1]
+
+    def _lrem(self, key, count, value):
+        lst = self.data.get(key, [])
+        removed = lst.count(value)
+        self.data[key] = [v for v in lst if v != value]
+        return removed
+
+    def _publish(self, channel, message):
+        return 0
+
+    def _eval(self, script, numkeys, *args):
+        # из скриптов бот использует только снятие блокировки по токену
+        assert script == main.RELEASE_LOCK_SCRIPT
+        key, token = args
+        if self.data.get(key) == token:
+            return self._delete(key)
+        return 0
+
+
+class BotHarness:
+    """Прогоняет апдейты через настоящий dp и даёт счётчики обращений к Bot API, Redis и users.json."""
+
+    def __init__(self, session: FakeSession, redis: FakeRedis, users_reads: Counter):
+        self.session = session
+        self.redis = redis
+        self.users_reads = users_reads
+        self.update_id = 0
+
+    def reset(self):
+        self.session.calls.clear()
+        self.redis.reset_counters()
+        self.users_reads.clear()
+        # снимаем антифлуд, чтобы сценарий мерил только сам хендлер
+        self.redis.forget('antiflood_')
+
+    def message_update(self, user_id: int, text: str) -> types.Update:
+        self.update_id += 1
+        return types.Update(update_id=self.update_id, message=types.Message(
+            message_id=self.update_id,
+            date=datetime.now(),
+            chat=types.Chat(id=user_id, type='private'),
+            from_user=types.User(id=user_id, is_bot=False, first_name='User'),
+            text=text,
+        ))
+
+    def callback_update(self, user_id: int, data: str) -> types.Update:
+        """Нажатие инлайн-кнопки под сообщением бота: from_user сообщения — сам бот."""
+        self.update_id += 1
+        return types.Update(update_id=self.update_id, callback_query=types.CallbackQuery(
+            id=str(self.update_id),
+            from_user=types.User(id=user_id, is_bot=False, first_name='User'),
+            chat_instance='1',
+            data=data,
+            message=types.Message(
+                message_id=self.update_id,
+                date=datetime.now(),
+                chat=types.Chat(id=user_id, type='private'),
+                from_user=types.User(id=42, is_bot=True, first_name='Bot'),
+                text='Чтобы получить ключ, вы должны быть подписаны на наш канал!',
+            ),
+        ))
+
+    async def feed(self, *updates):
+        await asyncio.gather(*(main.dp.feed_update(main.bot, update) for update in updates))
+
+    def start(self, *user_ids: int):
+        asyncio.run(self.feed(*(self.message_update(user_id, '/start') for user_id in user_ids)))
+
+    def click(self, *user_ids: int, data: str = 'subchennel'):
+        asyncio.run(self.feed(*(self.callback_update(user_id, data) for user_id in user_ids)))
+
+
+@pytest.fixture
+def harness(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'keys.txt').write_text('\n'.join(f'KEY-{i}' for i in range(10)))
+
+    fake_redis = FakeRedis()
+    session = FakeSession()
+    monkeypatch.setattr(main, 'redis_client', AutoPipelineRedis(fake_redis))
+    monkeypatch.setattr(main, 'key_store', LocalKeyStore(str(tmp_path / 'keys.db')))
+    monkeypatch.setattr(main, 'user_cache', UserCache())
+    monkeypatch.setattr(main, 'banned_users', {})
+    monkeypatch.setattr(main, 'user_locks', {})
+    monkeypatch.setattr(main, 'worker_lock_tokens', {})
+    monkeypatch.setattr(main, 'active_processes', set())
+    monkeypatch.setattr(main.bot, 'session', session)
+
+    users_reads = Counter()
+    get_users = main.get_users
+
+    def counting_get_users():
+        users_reads['users.json'] += 1
+        return get_users()
+
+    monkeypatch.setattr(main, 'get_users', counting_get_users)
+
+    asyncio.run(main.load_keys_to_redis())
+    h = BotHarness(session, fake_redis, users_reads)
+    h.reset()
+    return h
@@ -0,0 +1,94 @@
+import asyncio
+
+import main
+
+
+def test_issued_keys_are_not_reloaded_from_file_after_restart(harness):
+    for user_id in range(100, 110):
+        harness.start(user_id)
+    assert harness.redis.data['keys_list'] == []
+    assert main.key_store.count() == 0
+
+    # перезапуск: keys.txt на диске всё ещё содержит выданные ключи
+    asyncio.run(main.load_keys_to_redis())
+
+    assert harness.redis.data['keys_list'] == []
+    assert main.key_store.count() == 0
+
+
+def test_keys_issued_while_redis_is_down_are_reconciled(harness):
+    harness.redis.down = True
+    harness.start(100, 101)
+
+    # антифлуд пропустил апдейты, ключи выданы из локального хранилища
+    assert harness.session.calls['sendMessage'] == 6
+    assert main.key_store.count() == 8
+    assert harness.redis.data['keys_list'] == [f'KEY-{i}' for i in range(10)]
+
+    harness.redis.down = False
+    asyncio.run(main.load_keys_to_redis())
+
+    assert harness.redis.data['keys_list'] == [f'KEY-{i}' for i in range(2, 10)]
+    assert not main.key_store.has_pending()
+
+
+def test_keys_file_is_not_read_once_store_is_seeded(harness, monkeypatch):
+    def get_keys():
+        raise AssertionError('keys file read after seeding')
+
+    monkeypatch.setattr(main, 'get_keys', get_keys)
+
+    asyncio.run(main.load_keys_to_redis())
+
+    assert main.key_store.count() == 10
+
+
+def test_concurrent_workers_seed_redis_once(harness):
+    harness.redis.data['keys_list'] = []
+
+    async def start_workers():
+        await asyncio.gather(main.load_keys_to_redis(), main.load_keys_to_redis())
+
+    asyncio.run(start_workers())
+
+    assert harness.redis.data['keys_list'] == [f'KEY-{i}' for i in range(10)]
+
+
+def test_claim_in_progress_on_another_worker_is_rejected(harness, monkeypatch):
+    monkeypatch.setattr(main, 'WEB_WORKERS', 2)
+    # другой воркер уже обрабатывает /start этого пользователя
+    harness.redis.data['process_lock_100'] = '1'
+
+    harness.start(100)
+
+    assert harness.redis.ops['lpop'] == 0
+    assert harness.session.calls['sendMessage'] == 1
+
+    del harness.redis.data['process_lock_100']
+    harness.reset()
+    harness.start(100)
+
+    assert harness.redis.ops['lpop'] == 1
+    # блокировки сняты после выдачи
+    assert 'process_lock_100' not in harness.redis.data
+    assert 'claim_lock_100' not in harness.redis.data
+
+
+def test_worker_lock_taken_over_after_expiry_is_not_released(harness, monkeypatch):
+    monkeypatch.setattr(main, 'WEB_WORKERS', 2)
+
+    async def scenario():
+        assert await main.acquire_worker_lock('claim_lock_100', main.LOCK_TTL)
+        # TTL истёк, блокировку взял другой воркер
+        harness.redis.data['claim_lock_100'] = 'other-worker'
+        await main.release_worker_lock('claim_lock_100')
+
+    asyncio.run(scenario())
+
+    assert harness.redis.data['claim_lock_100'] == 'other-worker'
+
+    del harness.redis.data['claim_lock_100']
+    harness.start(100)
+    # свои блокировки после выдачи ключа сняты
+    assert harness.redis.ops['lpop'] == 1
+    assert not [k for k in harness.redis.data if k.endswith('_lock_100')]
@@ -0,0 +1,47 @@
+import asyncio
+
+from redis_layer import AutoPipelineRedis
+
+
+async def start_slow_redis(delay: float):
+    """Минимальный сервер по протоколу RESP: на любую команду отвечает +OK с задержкой."""
+
+    async def serve(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # команда приходит массивом bulk-строк: *N, затем N пар $len / значение
+                for _ in range(int(line[1:])):
+                    await reader.readline()
+                    await reader.readline()
+                await asyncio.sleep(delay)
+                writer.write(b'+OK\r\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve, '127.0.0.1', 0)
+
+
+def test_commands_wait_for_a_free_connection_instead_of_failing():
+    async def scenario():
+        server = await start_slow_redis(delay=0.02)
+        port = server.sockets[0].getsockname()[1]
+        client = AutoPipelineRedis.from_url(f'redis://127.0.0.1:{port}/0', pool_size=2, command_timeout=5)
+        try:
+            tasks = []
+            # каждая команда на своём проходе loop, то есть свой пайплайн, а соединений всего два
+            for i in range(20):
+                tasks.append(asyncio.create_task(client.set(f'key{i}', i)))
+                await asyncio.sleep(0)
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            await client.aclose()
+            server.close()
+            await server.wait_closed()
+
+    results = asyncio.run(scenario())
+
+    assert results == [True] * 20
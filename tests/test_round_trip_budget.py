@@ -0,0 +1,133 @@
+"""
+Бюджеты обращений к Redis и Bot API для горячих сценариев.
+
+Если тест упал, значит изменение добавило round trip в путь обработки апдейта.
+Поднимайте бюджет только осознанно.
+"""
+import json
+import time
+
+import main
+
+CHANNELS_COUNT = len(main.CHANNELS)
+
+# Антифлуд на каждое сообщение: HGETALL, затем HSET + EXPIRE одним пайплайном
+THROTTLE_OPS = 3
+THROTTLE_ROUND_TRIPS = 2
+
+
+def write_users(users: dict):
+    with open('users.json', 'w') as file:
+        json.dump(users, file)
+
+
+def test_fresh_claim(harness):
+    harness.start(100)
+
+    assert harness.session.calls['getChatMember'] <= CHANNELS_COUNT
+    # приветствие, «Вы подписаны», ключ
+    assert harness.session.calls['sendMessage'] == 3
+    # + LPOP и LLEN одним пайплайном, + PUBLISH инвалидации кэша
+    assert harness.redis.total_ops <= THROTTLE_OPS + 3
+    assert harness.redis.round_trips <= THROTTLE_ROUND_TRIPS + 2
+    assert harness.redis.ops['lpop'] == 1
+
+
+def test_returning_ineligible_user_is_answered_from_cache(harness):
+    harness.start(100)
+    harness.reset()
+
+    harness.start(100)
+
+    assert harness.session.calls['getChatMember'] == 0
+    assert harness.session.calls['sendMessage'] == 1
+    assert harness.users_reads['users.json'] == 0
+    # сам хендлер в Redis не ходит
+    assert harness.redis.total_ops <= THROTTLE_OPS
+    assert harness.redis.round_trips <= THROTTLE_ROUND_TRIPS
+
+
+def test_returning_ineligible_user_with_cold_cache(harness):
+    write_users({'100': {'referal': '', 'last_key_time': time.time()}})
+
+    harness.start(100)
+
+    assert harness.session.calls['getChatMember'] <= CHANNELS_COUNT
+    assert harness.users_reads['users.json'] == 1
+    assert harness.redis.total_ops <= THROTTLE_OPS
+    assert harness.redis.ops['lpop'] == 0
+
+    # вердикт закэширован, следующее нажатие идёт быстрым путём
+    harness.reset()
+    harness.start(100)
+    assert harness.session.calls['getChatMember'] == 0
+    assert harness.users_reads['users.json'] == 0
+
+
+def test_subscribe_button_after_claim_is_answered_from_cache(harness):
+    harness.start(100)
+    harness.reset()
+
+    harness.click(100)
+
+    assert harness.session.calls['answerCallbackQuery'] == 1
+    assert harness.session.calls['getChatMember'] == 0
+    assert harness.session.calls['sendMessage'] == 1
+    assert harness.users_reads['users.json'] == 0
+    # только антифлуд колбэков
+    assert harness.redis.total_ops <= THROTTLE_OPS
+    assert harness.redis.round_trips <= THROTTLE_ROUND_TRIPS
+    # кнопку нажал пользователь, а не бот, чьё сообщение под ней
+    with open('users.json') as file:
+        assert list(json.load(file)) == ['100']
+
+
+def test_unsubscribed_user(harness):
+    harness.session.unsubscribed.add(('@channel1', 100))
+
+    harness.start(100)
+
+    # проверка останавливается на первом канале без подписки
+    assert harness.session.calls['getChatMember'] == 1
+    # приветствие и просьба подписаться
+    assert harness.session.calls['sendMessage'] == 2
+    assert harness.redis.total_ops <= THROTTLE_OPS
+    assert harness.redis.ops['lpop'] == 0
+
+
+def test_flooder_is_warned_once_then_dropped_then_banned(harness):
+    write_users({'100': {'referal': '', 'last_key_time': time.time()}})
+    harness.start(100)
+    harness.reset()
+
+    harness.start(100)  # проходит
+    harness.start(100)  # первое превышение: предупреждение
+    assert harness.session.calls['sendMessage'] == 2
+
+    harness.session.calls.clear()
+    for _ in range(main.THROTTLE_BAN_AFTER - 1):
+        harness.start(100)
+    # молча отбрасываем, последнее превышение выдаёт бан
+    assert sum(harness.session.calls.values()) == 0
+    assert main.is_banned(100)
+
+    harness.session.calls.clear()
+    harness.redis.reset_counters()
+    harness.start(100)
+    # забаненный отсекается по локальному списку без сети
+    assert sum(harness.session.calls.values()) == 0
+    assert harness.redis.total_ops == 0
+
+
+def test_concurrent_updates_share_round_trips(harness):
+    users = list(range(200, 220))
+    write_users({str(u): {'referal': '', 'last_key_time': time.time()} for u in users})
+    harness.start(*users)
+    harness.reset()
+
+    harness.start(*users)
+
+    assert harness.session.calls['getChatMember'] == 0
+    assert harness.redis.total_ops == THROTTLE_OPS * len(users)
+    # команды всех апдейтов уходят общими пайплайнами
+    assert harness.redis.round_trips <= THROTTLE_ROUND_TRIPS
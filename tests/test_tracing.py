@@ -0,0 +1,20 @@
+import asyncio
+
+import tracing
+
+
+def test_overlapping_spans_are_not_subtracted_twice():
+    async def wait(name: str):
+        with tracing.span(name):
+            await asyncio.sleep(0.05)
+
+    async def scenario():
+        with tracing.trace('update') as update_trace:
+            await asyncio.gather(wait('bot.getChatMember'), wait('redis.hgetall'))
+        return update_trace.summary()
+
+    summary = asyncio.run(scenario())
+
+    spans_ms = sum(span['ms'] for span in summary['spans'].values())
+    assert spans_ms > summary['total_ms']
+    assert 0 <= summary['other_ms'] < 20
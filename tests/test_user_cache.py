@@ -0,0 +1,63 @@
+import asyncio
+
+from redis_layer import AutoPipelineRedis
+from user_cache import UserCache
+
+
+def bulk(value: str) -> bytes:
+    return f'${len(value)}\r\n{value}\r\n'.encode()
+
+
+async def start_pubsub_redis(message: str, delay: float):
+    """RESP-сервер, который подтверждает SUBSCRIBE и через delay секунд присылает одно сообщение."""
+
+    async def serve(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                args = []
+                for _ in range(int(line[1:])):
+                    await reader.readline()
+                    args.append((await reader.readline()).strip().decode())
+                if args[0].upper() != 'SUBSCRIBE':
+                    writer.write(b'+OK\r\n')
+                    continue
+                writer.write(b'*3\r\n' + bulk('subscribe') + bulk(args[1]) + b':1\r\n')
+                await writer.drain()
+                await asyncio.sleep(delay)
+                writer.write(b'*3\r\n' + bulk('message') + bulk(args[1]) + bulk(message))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(serve, '127.0.0.1', 0)
+
+
+def test_idle_subscription_outlives_socket_timeout():
+    cache = UserCache()
+    cache.set('100', 1.0)
+
+    async def scenario():
+        # сообщение придёт позже socket_timeout: простой канала не должен рвать подписку
+        server = await start_pubsub_redis('0:100', delay=0.5)
+        port = server.sockets[0].getsockname()[1]
+        client = AutoPipelineRedis.from_url(f'redis://127.0.0.1:{port}/0', socket_timeout=0.1)
+        listener = asyncio.create_task(cache.listen_invalidations(client, poll_timeout=0.05))
+        try:
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if listener.done() or cache.next_eligible_at('100') is None:
+                    break
+            assert not listener.done(), listener.exception()
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            await client.aclose()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+    assert cache.next_eligible_at('100') is None
@@ -0,0 +1,25 @@
+import json
+import multiprocessing
+
+import main
+
+
+def register_users(first: int, count: int):
+    for user_id in range(first, first + count):
+        main.update_users({str(user_id): {'referal': ''}})
+
+
+def test_workers_writing_users_concurrently_keep_each_others_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    ctx = multiprocessing.get_context('fork')
+    workers = [ctx.Process(target=register_users, args=(first, 50)) for first in (1000, 2000, 3000)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+
+    with open('users.json') as file:
+        users = json.load(file)
+
+    assert [process.exitcode for process in workers] == [0, 0, 0]
+    assert len(users) == 150
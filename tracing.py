@@ -0,0 +1,144 @@
+import asyncio
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from aiogram.client.session.aiohttp import AiohttpSession
+
+# Трейс текущего апдейта. Благодаря contextvars он виден во всех корутинах,
+# которые обрабатывают этот апдейт, и не смешивается с соседними апдейтами.
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Trace:
+    """
+    Время апдейта по спанам. Спаны из параллельных корутин (gather, автопайплайн Redis)
+    перекрываются, поэтому сумма их времени может быть больше total_ms. Для other_ms
+    берётся не сумма, а время, когда был открыт хотя бы один спан.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = {}  # имя спана -> [количество вызовов, суммарное время]
+        self.covered = 0.0  # сколько времени был открыт хотя бы один спан
+        self._open_spans = 0
+        self._covered_since = 0.0
+
+    def add(self, name: str, elapsed: float):
+        stat = self.spans.setdefault(name, [0, 0.0])
+        stat[0] += 1
+        stat[1] += elapsed
+
+    def span_opened(self, now: float):
+        if not self._open_spans:
+            self._covered_since = now
+        self._open_spans += 1
+
+    def span_closed(self, now: float):
+        self._open_spans -= 1
+        if not self._open_spans:
+            self.covered += now - self._covered_since
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> dict:
+        total = self.elapsed()
+        spans = {
+            name: {'count': count, 'ms': round(elapsed * 1000, 2)}
+            for name, (count, elapsed) in sorted(self.spans.items(), key=lambda item: -item[1][1])
+        }
+        # всё, что не попало в спаны: CPU на разбор апдейта, фильтры, логика хендлеров
+        other = total - self.covered
+        return {'trace': self.name, 'total_ms': round(total * 1000, 2), 'other_ms': round(other * 1000, 2),
+                'spans': spans}
+
+
+@contextmanager
+def trace(name: str):
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str):
+    current = _current_trace.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    current.span_opened(started)
+    try:
+        yield
+    finally:
+        finished = time.perf_counter()
+        current.span_closed(finished)
+        current.add(name, finished - started)
+
+
+def traced(name: str):
+    """Декоратор: записывает время выполнения функции (обычной или корутины) в спан name."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class TracedAiohttpSession(AiohttpSession):
+    async def make_request(self, bot, method, timeout=None):
+        # сюда входит и время на прокси
+        with span(f'bot.{method.__api_method__}'):
+            return await super().make_request(bot, method, timeout)
+
+
+def sample_stacks(thread_id: int, seconds: float, interval: float = 0.005) -> Counter:
+    """
+    Сэмплирующий профайлер: раз в interval снимает стек потока thread_id.
+    Блокирующий, запускать в отдельном потоке.
+
+    :return: Counter свёрнутых стеков ("модуль:функция;..." -> число сэмплов)
+    """
+    stacks = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f'{frame.f_globals.get("__name__", "?")}:{code.co_name}')
+            frame = frame.f_back
+        if frames:
+            stacks[';'.join(reversed(frames))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+async def profile(seconds: float) -> str:
+    """Профилирует поток event loop в течение seconds секунд.
+    Возвращает данные в формате folded stacks для flamegraph.pl / speedscope."""
+    thread_id = threading.get_ident()
+    stacks = await asyncio.to_thread(sample_stacks, thread_id, seconds)
+    return '\n'.join(f'{stack} {count}' for stack, count in stacks.most_common())
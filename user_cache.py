@@ -0,0 +1,63 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+INVALIDATE_CHANNEL = 'user_cache_invalidate'
+
+
+class UserCache:
+    """
+    LRU-кэш с TTL для вердиктов вида «ключ уже получен, следующий можно будет
+    получить в момент T». Сами данные пользователей не кэшируются: когда вердикта
+    нет, обработчик читает users.json как обычно.
+
+    Между процессами кэш инвалидируется через Redis pub/sub: процесс, изменивший
+    пользователя, публикует его id, остальные выкидывают запись из своего кэша.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # user_id -> (истекает, next_eligible_at)
+
+    def next_eligible_at(self, user_id: str) -> Optional[float]:
+        """Время, раньше которого пользователь точно не может получить ключ, или None, если неизвестно."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry[1]
+
+    def set(self, user_id: str, next_eligible_at: float):
+        self._entries[user_id] = (time.monotonic() + self.ttl, next_eligible_at)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    async def publish_invalidation(self, redis_client, user_id: str):
+        await redis_client.publish(INVALIDATE_CHANNEL, f'{os.getpid()}:{user_id}')
+
+    async def listen_invalidations(self, redis_client, poll_timeout: float = 1.0):
+        """Слушает инвалидации от других процессов, пока не оборвётся соединение."""
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATE_CHANNEL)
+            while True:
+                # listen() ждёт с socket_timeout пула и падает с TimeoutError, если в канале тихо.
+                # С явным таймаутом простой — не ошибка: get_message просто вернёт None
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=poll_timeout)
+                if message is None:
+                    continue
+                origin, _, user_id = str(message['data']).partition(':')
+                # свои изменения уже учтены в локальном кэше
+                if origin != str(os.getpid()):
+                    self.invalidate(user_id)
+        finally:
+            await pubsub.aclose()